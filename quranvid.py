@@ -1,3 +1,11 @@
+import signal
+
+# SIGUSR1 terminates by default and execv resets handlers, so ignore it before the slow
+# imports; ignored signals also survive execv, closing the gap while a worker recycles.
+# The snapshot handler is installed once tracemalloc_handler is defined below.
+if hasattr(signal, 'SIGUSR1'):
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+
 import random
 import requests
 import json
@@ -8,8 +16,13 @@ from pathlib import Path
 import time
 from io import BytesIO
 import re
-import signal
+import unicodedata
+import struct
 import sys
+import gc
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Create necessary directories
 os.makedirs('temp', exist_ok=True)
@@ -17,6 +30,42 @@ os.makedirs('output', exist_ok=True)
 os.makedirs('temp/frames', exist_ok=True)
 os.makedirs('assets', exist_ok=True)
 
+# Reciter ids from the verse API's audio map to render, comma separated, or "all".
+# More than one reciter fans out: the video is encoded once and each reciter's
+# audio is muxed against it.
+RECITERS = [r.strip() for r in os.environ.get('QURANVID_RECITERS', '2').split(',') if r.strip()]
+FAN_OUT = RECITERS == ['all'] or len(RECITERS) > 1
+
+# Number of reciter audio tracks downloaded and enhanced at the same time
+AUDIO_WORKERS = int(os.environ.get('QURANVID_AUDIO_WORKERS', '4'))
+
+# How verse text is rendered: "pil" draws it into every frame, "ass" reuses one
+# pre-rendered template and burns the text in with libass during the encode
+TEXT_RENDER_MODE = os.environ.get('QURANVID_TEXT_MODE', 'pil').lower()
+
+# Also attach the verse as a soft subtitle track and write a .srt next to each video
+SOFT_SUBTITLES = os.environ.get('QURANVID_SOFT_SUBTITLES', '0').lower() in ('1', 'true', 'yes')
+
+# Recycle the worker between videos once its RSS goes over this many MB (0 disables)
+MEMORY_BUDGET_MB = float(os.environ.get('QURANVID_MEMORY_BUDGET_MB', '0'))
+
+# Trace allocations from startup; otherwise SIGUSR1 starts tracing and later writes snapshots
+TRACEMALLOC_ENABLED = os.environ.get('QURANVID_TRACEMALLOC', '0').lower() in ('1', 'true', 'yes')
+TRACEMALLOC_FRAMES = int(os.environ.get('QURANVID_TRACEMALLOC_FRAMES', '1'))
+
+# Seconds between RSS samples where the kernel's peak RSS cannot be reset per stage
+MEMORY_SAMPLE_INTERVAL = float(os.environ.get('QURANVID_MEMORY_SAMPLE_INTERVAL', '0.05'))
+
+# Where a recycled worker leaves its position for the process that replaces it
+WORKER_STATE_PATH = 'temp/worker_state.json'
+
+# ASS font size per PIL em size, cached per font file
+ass_font_scales = {}
+
+# Current and peak RSS recorded per pipeline stage
+memory_stats = {'stages': {}}
+memory_stats_lock = threading.Lock()
+
 def get_arabic_font():
     """Try different methods to get an Arabic-compatible font"""
     # Use the custom font path
@@ -342,13 +391,265 @@ def create_frame(width, height, texts, positions, font_paths, font_sizes):
     
     return final_image
 
+def get_template_frame(width, height):
+    """Pre-render the background and decorative frame once per template size"""
+    template_path = f"temp/frames/template_{width}x{height}.png"
+    if os.path.exists(template_path) and os.path.getsize(template_path) > 0:
+        return template_path
+    
+    try:
+        os.makedirs('temp/frames', exist_ok=True)
+        image = create_epic_background(width, height).convert('RGBA')
+        image = Image.alpha_composite(image, create_decorative_frame(width, height))
+        image.convert('RGB').save(template_path)
+        print(f"Template frame saved to {template_path}")
+        return template_path
+    except Exception as e:
+        print(f"Error saving template frame: {e}")
+        return None
+
+def get_font_family(font_path):
+    """Get the family name libass needs to look up a font file"""
+    try:
+        return ImageFont.truetype(font_path, 10).getname()[0]
+    except (OSError, TypeError, AttributeError, ValueError):
+        return 'Sans'
+
+def get_ass_font_scale(font_path):
+    """Get the ASS font size per PIL em size, from the font's OS/2 win metrics"""
+    if font_path in ass_font_scales:
+        return ass_font_scales[font_path]
+    
+    # Like VSFilter, libass scales a font so usWinAscent + usWinDescent equals Fontsize
+    scale = 1.0
+    try:
+        with open(font_path, 'rb') as f:
+            data = f.read()
+        offset = 0
+        if data[:4] == b'ttcf':
+            # Font collections: use the first font, as PIL does by default
+            offset = struct.unpack('>I', data[12:16])[0]
+        num_tables = struct.unpack('>H', data[offset + 4:offset + 6])[0]
+        tables = {}
+        for i in range(num_tables):
+            record = offset + 12 + i * 16
+            tables[data[record:record + 4]] = struct.unpack('>I', data[record + 8:record + 12])[0]
+        units_per_em = struct.unpack('>H', data[tables[b'head'] + 18:tables[b'head'] + 20])[0]
+        win_ascent, win_descent = struct.unpack('>HH', data[tables[b'OS/2'] + 74:tables[b'OS/2'] + 78])
+        if units_per_em and win_ascent + win_descent:
+            scale = (win_ascent + win_descent) / units_per_em
+    except (OSError, TypeError, KeyError, struct.error) as e:
+        print(f"Warning: Could not read OS/2 metrics from {font_path}: {e}")
+    
+    ass_font_scales[font_path] = scale
+    return scale
+
+def estimate_ass_font_size(text, font_path, max_width, max_height, initial_size):
+    """Fit the text like auto_scale_font and return the matching ASS font size"""
+    try:
+        font = ImageFont.truetype(font_path, initial_size)
+    except (OSError, TypeError, ValueError, AttributeError):
+        font = None
+    
+    font_size = initial_size
+    while True:
+        if font:
+            line_height = sum(font.getmetrics())
+            line_count = len(wrap_text_by_length(text, font, max_width)) or 1
+        else:
+            # Without the font file, assume a spacing glyph is about half the font size wide
+            line_height = font_size
+            glyph_count = sum(1 for c in text if not unicodedata.combining(c))
+            line_count = max(1, -(-int(glyph_count * font_size * 0.5) // max_width))
+        
+        if line_count * line_height <= max_height or font_size <= 10:
+            break
+        
+        font_size -= 2  # Reduce font size and retry
+        if font:
+            font = ImageFont.truetype(font_path, font_size)
+    
+    # Convert the fitted PIL em size to the size libass will draw at the same em size
+    if not font:
+        return font_size
+    return round(font_size * get_ass_font_scale(font_path))
+
+def wrap_text_by_length(text, font, max_width):
+    """Wrap text on spaces using glyph advances only, without drawing"""
+    lines = []
+    current_line = ""
+    for word in text.split():
+        test_line = current_line + " " + word if current_line else word
+        if font.getlength(test_line) <= max_width or not current_line:
+            current_line = test_line
+        else:
+            lines.append(current_line)
+            current_line = word
+    if current_line:
+        lines.append(current_line)
+    return lines
+
+def ass_color(rgb, alpha=0):
+    """Convert an RGB tuple to an ASS &HAABBGGRR colour"""
+    r, g, b = rgb
+    return f"&H{alpha:02X}{b:02X}{g:02X}{r:02X}"
+
+def format_ass_time(seconds):
+    """Format seconds as an ASS H:MM:SS.cc timestamp"""
+    centiseconds = int(round(seconds * 100))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02d}:{secs:02d}.{centiseconds:02d}"
+
+def format_srt_time(seconds):
+    """Format seconds as an SRT HH:MM:SS,mmm timestamp"""
+    milliseconds = int(round(seconds * 1000))
+    hours, milliseconds = divmod(milliseconds, 3600000)
+    minutes, milliseconds = divmod(milliseconds, 60000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d},{milliseconds:03d}"
+
+def escape_ass_text(text):
+    """Escape text so libass does not read it as override tags"""
+    return text.replace('{', '\\{').replace('}', '\\}').replace('\n', '\\N')
+
+def write_ass_subtitles(output_path, width, height, texts, positions, font_paths, font_sizes, duration):
+    """Write the frame text as a styled ASS subtitle track matching create_frame's layout"""
+    style_names = ['Title', 'VerseNumber', 'Arabic', 'Translation', 'Footer']
+    effective_width = width - 200  # Account for decorative border
+    end_time = format_ass_time(duration)
+    
+    styles = []
+    events = []
+    for i, (text, position, font_path, initial_size) in enumerate(zip(texts, positions, font_paths, font_sizes)):
+        # Skip empty text
+        if not text:
+            continue
+        
+        style_name = style_names[i] if i < len(style_names) else f"Text{i}"
+        max_height = 50 if i == 1 else 200  # Smaller height for verse number
+        font_size = estimate_ass_font_size(text, font_path, effective_width, max_height, initial_size)
+        
+        # White text with a black drop shadow, centred on its position
+        styles.append(
+            f"Style: {style_name},{get_font_family(font_path)},{font_size},"
+            f"{ass_color((255, 255, 255))},{ass_color((255, 255, 255))},"
+            f"{ass_color((0, 0, 0))},{ass_color((0, 0, 0))},"
+            f"0,0,0,0,100,100,0,0,1,0,2,5,100,100,0,1"
+        )
+        
+        # Blurred copy underneath for the light glow, then the text itself
+        line = escape_ass_text(text)
+        placement = f"\\an5\\pos({width // 2},{position})"
+        glow = "\\1c&HC8FFFF&\\1a&H9B&\\shad0\\blur10"
+        events.append(f"Dialogue: 0,0:00:00.00,{end_time},{style_name},,0,0,0,,{{{placement}{glow}}}{line}")
+        events.append(f"Dialogue: 1,0:00:00.00,{end_time},{style_name},,0,0,0,,{{{placement}}}{line}")
+    
+    content = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {width}",
+        f"PlayResY: {height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+        "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+        "Alignment, MarginL, MarginR, MarginV, Encoding",
+        *styles,
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+        *events,
+        "",
+    ]
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(content))
+    return output_path
+
+def write_srt_captions(output_path, lines, duration):
+    """Write the verse as a single SRT caption spanning the whole video"""
+    text = "\n".join(line for line in lines if line)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(f"1\n00:00:00,000 --> {format_srt_time(duration)}\n{text}\n")
+    return output_path
+
+def check_ass_text_scale(font_path, text="بِسْمِ ٱللَّهِ", font_size=100, tolerance=0.1):
+    """Render one line in both modes and warn if libass draws it at a different height than PIL"""
+    width, height = 1920, 400
+    subtitle_path = 'temp/scale_check.ass'
+    rendered_path = 'temp/scale_check.png'
+    
+    # PIL mode: draw the line at the em size create_frame would use
+    pil_image = Image.new('L', (width, height), 0)
+    ImageDraw.Draw(pil_image).text((100, 100), text, font=ImageFont.truetype(font_path, font_size), fill=255)
+    pil_box = pil_image.getbbox()
+    
+    # ASS mode: burn the same line onto a black frame with libass
+    fitted_size = round(font_size * get_ass_font_scale(font_path))
+    with open(subtitle_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join([
+            "[Script Info]",
+            "ScriptType: v4.00+",
+            f"PlayResX: {width}",
+            f"PlayResY: {height}",
+            "ScaledBorderAndShadow: yes",
+            "",
+            "[V4+ Styles]",
+            "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, "
+            "Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, "
+            "Alignment, MarginL, MarginR, MarginV, Encoding",
+            f"Style: Check,{get_font_family(font_path)},{fitted_size},&H00FFFFFF,&H00FFFFFF,&H00000000,"
+            "&H00000000,0,0,0,0,100,100,0,0,1,0,0,5,0,0,0,1",
+            "",
+            "[Events]",
+            "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+            f"Dialogue: 0,0:00:00.00,0:00:01.00,Check,,0,0,0,,{{\\an5\\pos({width // 2},{height // 2})}}{escape_ass_text(text)}",
+            "",
+        ]))
+    cmd = [
+        'ffmpeg', '-y', '-v', 'error',
+        '-f', 'lavfi', '-i', f"color=black:s={width}x{height}:d=1",
+        '-vf', f"subtitles=filename={escape_filter_path(subtitle_path)}"
+               f":fontsdir={escape_filter_path(os.path.dirname(os.path.abspath(font_path)))}",
+        '-frames:v', '1',
+        rendered_path
+    ]
+    try:
+        subprocess.run(cmd, check=True)
+        with Image.open(rendered_path) as rendered:
+            ass_box = rendered.convert('L').point(lambda value: 255 if value > 64 else 0).getbbox()
+    except (subprocess.SubprocessError, FileNotFoundError, OSError) as e:
+        print(f"Warning: Could not check ASS text scale: {e}")
+        return None
+    finally:
+        for path in (subtitle_path, rendered_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    if not pil_box or not ass_box:
+        print("Warning: Could not check ASS text scale: nothing was drawn")
+        return None
+    
+    # Compare the inked height of the line in both modes
+    ratio = (ass_box[3] - ass_box[1]) / (pil_box[3] - pil_box[1])
+    if abs(ratio - 1) > tolerance:
+        print(f"Warning: ASS text renders at {ratio:.0%} of its PIL size with {font_path}")
+    else:
+        print(f"ASS text scale check passed ({ratio:.0%} of PIL size)")
+    return ratio
+
 def download_audio(url, output_path):
     """Download audio file"""
-    response = requests.get(url)
-    if response.status_code == 200:
-        with open(output_path, 'wb') as f:
-            f.write(response.content)
-        return True
+    # Stream to disk so the whole body is never held in memory
+    with requests.get(url, stream=True, timeout=30) as response:
+        if response.status_code == 200:
+            with open(output_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=64 * 1024):
+                    f.write(chunk)
+            return True
     return False
 
 def enhance_audio(input_path, output_path):
@@ -407,7 +708,7 @@ def sanitize_filename(text):
     return sanitized
 
 def create_video(verse_data, surah_data):
-    """Create epic video from frames and audio with enhanced effects"""
+    """Create epic videos from one frame and each reciter's audio, returning the output paths"""
     width, height = 1920, 1080
     
     # Use the custom Arabic font path
@@ -484,92 +785,228 @@ def create_video(verse_data, surah_data):
         english_font_path         # Footer
     ]
 
-    # Create epic frame
-    frame = create_frame(width, height, texts, positions, font_paths, font_sizes)
-    
-    # Save frame with proper error handling
-    try:
-        # Create the directory if it doesn't exist
-        os.makedirs('temp/frames', exist_ok=True)
-        frame_path = "temp/frames/frame.png"
-        frame.save(frame_path)
+    if TEXT_RENDER_MODE == 'ass':
+        # Reuse the pre-rendered template, the text is burned in by libass during the encode
+        frame_path = get_template_frame(width, height)
+        log_memory('render frame')
+        if not frame_path:
+            return None
+        temp_paths = []
+    else:
+        # Create epic frame
+        frame = create_frame(width, height, texts, positions, font_paths, font_sizes)
         
-        # Verify the frame was actually created
-        if not os.path.exists(frame_path) or os.path.getsize(frame_path) == 0:
-            raise Exception("Frame not properly saved")
+        # Save frame with proper error handling
+        try:
+            # Create the directory if it doesn't exist
+            os.makedirs('temp/frames', exist_ok=True)
+            frame_path = "temp/frames/frame.png"
+            frame.save(frame_path)
+            frame.close()
+            log_memory('render frame')
             
-        print(f"Frame successfully saved to {frame_path}")
-    except Exception as e:
-        print(f"Error saving frame: {e}")
-        return None
+            # Verify the frame was actually created
+            if not os.path.exists(frame_path) or os.path.getsize(frame_path) == 0:
+                raise Exception("Frame not properly saved")
+                
+            print(f"Frame successfully saved to {frame_path}")
+        except Exception as e:
+            print(f"Error saving frame: {e}")
+            return None
+        temp_paths = [frame_path]
 
-    # Download audio
-    raw_audio_path = 'temp/audio_raw.mp3'
-    enhanced_audio_path = 'temp/audio_enhanced.mp3'
-    
-    # Get audio URL safely
-    audio_url = None
-    try:
-        audio_url = verse_data.get('audio', {}).get('2', {}).get('url')
-    except (KeyError, AttributeError):
-        print("Warning: Could not find audio URL in verse data")
-    
-    if not audio_url:
+    # Work out which reciters to produce videos for
+    reciter_ids = get_reciter_ids(verse_data)
+    if not reciter_ids:
         print("Error: No audio URL available")
+        cleanup_temp_files(temp_paths, {})
         return None
     
-    # Download and enhance audio
-    if download_audio(audio_url, raw_audio_path):
-        enhance_audio(raw_audio_path, enhanced_audio_path)
-    else:
+    # Track every reciter's audio files up front so failed downloads are cleaned up too
+    for reciter_id in reciter_ids:
+        temp_paths.extend(get_reciter_audio_paths(reciter_id))
+    
+    # Download and enhance every reciter's audio in parallel
+    audio_tracks = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(AUDIO_WORKERS, len(reciter_ids)))) as executor:
+        futures = {
+            executor.submit(prepare_reciter_audio, verse_data, reciter_id): reciter_id
+            for reciter_id in reciter_ids
+        }
+        for future in as_completed(futures):
+            reciter_id = futures[future]
+            try:
+                track = future.result()
+            except Exception as e:
+                print(f"Error preparing audio for reciter {reciter_id}: {e}")
+                track = None
+            if track:
+                audio_tracks[reciter_id] = track
+    
+    log_memory('prepare audio')
+    if not audio_tracks:
         print("Error: Failed to download audio")
+        cleanup_temp_files(temp_paths, audio_tracks)
         return None
     
-    # Get audio duration using ffprobe
+    # Create output directory if it doesn't exist
+    os.makedirs('output', exist_ok=True)
+    
+    # Create a sanitized filename from the Arabic text
+    arabic_filename = sanitize_filename(arabic)
+    
+    # Encode the visual track once, long enough for the longest recitation
+    shared_video_path = 'temp/video_shared.mp4'
+    temp_paths.append(shared_video_path)
+    longest_duration = max(track['duration'] for track in audio_tracks.values())
+    
+    # Generate the styled subtitle track for libass to burn in
+    subtitle_path = None
+    fonts_dir = None
+    if TEXT_RENDER_MODE == 'ass':
+        subtitle_path = 'temp/verse.ass'
+        temp_paths.append(subtitle_path)
+        write_ass_subtitles(subtitle_path, width, height, texts, positions, font_paths, font_sizes, longest_duration)
+        if arabic_font_path:
+            fonts_dir = os.path.dirname(os.path.abspath(arabic_font_path))
+    
+    if not encode_shared_video(frame_path, longest_duration, shared_video_path, subtitle_path, fonts_dir):
+        cleanup_temp_files(temp_paths, audio_tracks)
+        return None
+    log_memory('encode video')
+    
+    # Mux each reciter's audio against the shared video by stream copy
+    output_paths = []
+    for reciter_id in reciter_ids:
+        track = audio_tracks.get(reciter_id)
+        if not track:
+            continue
+        
+        # Use Arabic text as part of the filename, plus the reciter when fanning out
+        reciter_suffix = f"_R{reciter_id}" if FAN_OUT else ""
+        output_path = f'output/{arabic_filename}_S{verse_data.get("surahNo", "unknown")}_V{verse_data.get("ayahNo", "unknown")}{reciter_suffix}.mp4'
+        
+        # Write Arabic and English caption files next to the video and attach them as soft subtitle tracks
+        captions = []
+        if SOFT_SUBTITLES:
+            output_stem = os.path.splitext(output_path)[0]
+            for language, suffix, text in [('ara', 'ar', arabic), ('eng', 'en', english_text)]:
+                if text:
+                    caption_path = write_srt_captions(f"{output_stem}.{suffix}.srt", [text], track['duration'])
+                    captions.append((language, caption_path))
+        
+        if mux_reciter_video(shared_video_path, track['path'], track['duration'], output_path, captions):
+            print(f"Video successfully created at {output_path} ({track['reciter']})")
+            output_paths.append(output_path)
+    
+    log_memory('mux reciters')
+    
+    # Cleanup
+    cleanup_temp_files(temp_paths, audio_tracks)
+    
+    return output_paths or None
+
+def get_reciter_ids(verse_data):
+    """Return the reciter ids to render, limited to those the verse has audio for"""
+    available = verse_data.get('audio') if isinstance(verse_data, dict) else None
+    if not isinstance(available, dict):
+        print("Warning: Could not find audio URL in verse data")
+        return []
+    
+    if RECITERS == ['all']:
+        requested = sorted(available, key=lambda key: (0, int(key), '') if str(key).isdigit() else (1, 0, str(key)))
+    else:
+        requested = RECITERS
+    
+    reciter_ids = []
+    for reciter_id in requested:
+        # Skip malformed entries rather than failing the whole verse
+        audio_info = available.get(reciter_id)
+        if isinstance(audio_info, dict) and audio_info.get('url'):
+            reciter_ids.append(reciter_id)
+        else:
+            print(f"Warning: No audio URL for reciter {reciter_id}, skipping")
+    return reciter_ids
+
+def get_media_duration(path):
+    """Get the duration of an audio or video file using ffprobe, or None if it is unknown"""
     try:
         duration_cmd = [
-            'ffprobe', '-i', enhanced_audio_path,
+            'ffprobe', '-i', path,
             '-show_entries', 'format=duration',
             '-v', 'quiet', '-of', 'csv=p=0'
         ]
-        duration = float(subprocess.check_output(duration_cmd).decode().strip())
+        return float(subprocess.check_output(duration_cmd).decode().strip())
     except (subprocess.SubprocessError, ValueError, FileNotFoundError) as e:
-        print(f"Error getting audio duration: {e}")
-        # Fallback to a default duration
-        duration = 10.0
+        print(f"Error getting duration of {path}: {e}")
+        return None
+
+def get_reciter_audio_paths(reciter_id):
+    """Get the raw and enhanced temp audio paths for a reciter"""
+    return f'temp/audio_raw_{reciter_id}.mp3', f'temp/audio_enhanced_{reciter_id}.mp3'
+
+def prepare_reciter_audio(verse_data, reciter_id):
+    """Download and enhance one reciter's audio, returning its path and duration"""
+    audio_info = verse_data['audio'][reciter_id]
+    raw_audio_path, enhanced_audio_path = get_reciter_audio_paths(reciter_id)
     
-    # Create output directory if it doesn't exist
-    os.makedirs('output', exist_ok=True)
+    if not download_audio(audio_info['url'], raw_audio_path):
+        print(f"Error: Failed to download audio for reciter {reciter_id}")
+        return None
+    enhance_audio(raw_audio_path, enhanced_audio_path)
     
-    # Create a sanitized filename from the Arabic text
-    arabic_filename = sanitize_filename(arabic)
+    # A guessed duration would cut or pad this and the shared video, so drop the reciter instead
+    duration = get_media_duration(enhanced_audio_path)
+    if duration is None or duration <= 0:
+        print(f"Error: Could not get audio duration for reciter {reciter_id}, skipping")
+        return None
     
-    # Create video using ffmpeg with enhanced effects
-    # Use Arabic text as part of the filename
-    output_path = f'output/{arabic_filename}_S{verse_data.get("surahNo", "unknown")}_V{verse_data.get("ayahNo", "unknown")}.mp4'
+    return {
+        'reciter': audio_info.get('reciter', f"Reciter {reciter_id}"),
+        'raw_path': raw_audio_path,
+        'path': enhanced_audio_path,
+        'duration': duration,
+    }
+
+def escape_filter_path(path):
+    """Escape a path for use as an ffmpeg filter option value"""
+    path = path.replace('\\', '/')
+    # Escape for the filter option parser, then for the filtergraph parser
+    for char in "':":
+        path = path.replace(char, '\\' + char)
+    for char in "\\'[],;":
+        path = path.replace(char, '\\' + char)
+    return path
+
+def encode_shared_video(frame_path, duration, output_path, subtitle_path=None, fonts_dir=None):
+    """Encode the still frame into a silent video track shared by every reciter"""
+    # Burn in the subtitle track with libass when one is given
+    video_filters = []
+    if subtitle_path:
+        subtitle_filter = f"subtitles=filename={escape_filter_path(subtitle_path)}"
+        if fonts_dir:
+            subtitle_filter += f":fontsdir={escape_filter_path(fonts_dir)}"
+        video_filters = ['-vf', subtitle_filter]
     
-    # Simplified FFmpeg command for better compatibility
     cmd = [
         'ffmpeg', '-y',  # Overwrite output file if it exists
         '-loop', '1',    # Loop the image
-        '-i', 'temp/frames/frame.png',  # Input image
-        '-i', enhanced_audio_path,  # Input enhanced audio
+        '-i', frame_path,  # Input image
+        '-t', f"{duration:.3f}",  # Long enough for the longest recitation
+        *video_filters,
         '-c:v', 'libx264',  # Video codec
         '-tune', 'stillimage',  # Optimize for still image
         '-crf', '23',  # Reasonable quality
-        '-c:a', 'aac',    # Audio codec
-        '-b:a', '192k',   # Audio bitrate
         '-pix_fmt', 'yuv420p',  # Pixel format for compatibility
-        '-shortest',      # Duration determined by shortest input
+        '-an',            # Audio is muxed in per reciter
         output_path
     ]
     
     try:
         subprocess.run(cmd, check=True)
-        print(f"Video successfully created at {output_path}")
     except subprocess.CalledProcessError as e:
         print(f"Error creating video: {e}")
-        return None
+        return False
     
     # Try a simpler command if the first one fails
     if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
@@ -577,29 +1014,251 @@ def create_video(verse_data, surah_data):
         simple_cmd = [
             'ffmpeg', '-y',
             '-loop', '1',
-            '-i', 'temp/frames/frame.png',
-            '-i', enhanced_audio_path,
+            '-i', frame_path,
+            '-t', f"{duration:.3f}",
+            *video_filters,
             '-c:v', 'libx264',
-            '-c:a', 'aac',
-            '-b:a', '192k',
-            '-shortest',
+            '-an',
             output_path
         ]
         try:
             subprocess.run(simple_cmd, check=True)
         except subprocess.CalledProcessError as e:
             print(f"Error creating video with simple command: {e}")
-            return None
+            return False
+    
+    return True
+
+def mux_reciter_video(video_path, audio_path, duration, output_path, captions=None):
+    """Combine the shared video with one reciter's audio without re-encoding the video"""
+    # Attach each (language, path) caption as its own soft subtitle track
+    caption_inputs = []
+    caption_options = []
+    for index, (language, caption_path) in enumerate(captions or []):
+        caption_inputs += ['-i', caption_path]
+        caption_options += ['-map', f'{index + 2}:s:0', f'-metadata:s:s:{index}', f'language={language}']
+    if caption_options:
+        caption_options += ['-c:s', 'mov_text']
+    
+    cmd = [
+        'ffmpeg', '-y',
+        '-i', video_path,
+        '-i', audio_path,
+        *caption_inputs,
+        '-map', '0:v:0',
+        '-map', '1:a:0',
+        '-c:v', 'copy',   # Reuse the already encoded video stream
+        '-c:a', 'aac',    # Audio codec
+        '-b:a', '192k',   # Audio bitrate
+        *caption_options,
+        '-t', f"{duration:.3f}",  # Trim the shared video to this recitation
+        '-shortest',      # Never outlast the audio, whatever the probed duration
+        output_path
+    ]
     
-    # Cleanup
     try:
-        os.remove(raw_audio_path)
-        os.remove(enhanced_audio_path)
-        os.remove('temp/frames/frame.png')
-    except (OSError, FileNotFoundError) as e:
-        print(f"Warning during cleanup: {e}")
+        subprocess.run(cmd, check=True)
+    except subprocess.CalledProcessError as e:
+        print(f"Error muxing video: {e}")
+        return False
     
-    return output_path
+    return os.path.exists(output_path) and os.path.getsize(output_path) > 0
+
+def cleanup_temp_files(paths, audio_tracks):
+    """Remove intermediate frame, video and audio files"""
+    for track in audio_tracks.values():
+        paths = paths + [track['raw_path'], track['path']]
+    # Files of failed steps may never have been written
+    for path in dict.fromkeys(paths):
+        if not os.path.exists(path):
+            continue
+        try:
+            os.remove(path)
+        except (OSError, FileNotFoundError) as e:
+            print(f"Warning during cleanup: {e}")
+
+def get_current_rss_mb():
+    """Get the current resident set size of this process in MB"""
+    # Linux exposes the resident page count directly
+    try:
+        with open('/proc/self/statm') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        pass
+    
+    # Other platforms need psutil if it is installed
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        # The lifetime peak never goes down, so it cannot stand in for current RSS
+        return None
+
+def get_peak_rss_mb():
+    """Get the process-wide peak resident set size in MB, including any process replaced by exec"""
+    try:
+        import resource
+    except ImportError:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def reset_rss_high_water_mark():
+    """Reset the kernel's VmHWM to the current RSS, returning whether it worked"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def get_rss_high_water_mark_mb():
+    """Get VmHWM, the peak RSS since it was last reset, in MB"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def sample_rss():
+    """Keep the highest RSS seen since the current stage began"""
+    while True:
+        current = get_current_rss_mb()
+        # Hold the lock so a sample from the previous stage cannot overwrite a reset
+        with memory_stats_lock:
+            if current is not None and current > (memory_stats['sampled_peak'] or 0.0):
+                memory_stats['sampled_peak'] = current
+        time.sleep(MEMORY_SAMPLE_INTERVAL)
+
+def begin_memory_stage():
+    """Start measuring the peak RSS of the next pipeline stage"""
+    if reset_rss_high_water_mark() and get_rss_high_water_mark_mb() is not None:
+        memory_stats['peak_source'] = 'hwm'
+        return
+    
+    # No resettable high-water mark, so sample RSS in the background instead
+    with memory_stats_lock:
+        memory_stats['peak_source'] = 'sampled'
+        memory_stats['sampled_peak'] = get_current_rss_mb()
+    if not memory_stats.get('sampler'):
+        memory_stats['sampler'] = threading.Thread(target=sample_rss, daemon=True)
+        memory_stats['sampler'].start()
+
+def log_memory(stage):
+    """Record and print current and peak RSS of a pipeline stage, then start the next one.
+    
+    Returns the current RSS in MB, or None when this platform cannot report it.
+    """
+    current = get_current_rss_mb()
+    if current is None:
+        print(f"[memory] {stage}: current RSS unavailable (needs /proc or psutil), "
+              f"process-wide peak {get_peak_rss_mb():.1f} MB")
+        return None
+    
+    if memory_stats.get('peak_source') == 'sampled':
+        with memory_stats_lock:
+            stage_peak = memory_stats['sampled_peak'] or current
+    else:
+        stage_peak = get_rss_high_water_mark_mb() or current
+    stage_peak = max(stage_peak, current)
+    # Resetting VmHWM also resets ru_maxrss, so the process-wide peak is kept here
+    process_peak = max(memory_stats.get('process_peak', 0.0), stage_peak)
+    memory_stats['process_peak'] = process_peak
+    delta = current - memory_stats.get('last_rss', current)
+    memory_stats['last_rss'] = current
+    
+    stage_stats = memory_stats['stages'].setdefault(stage, {'current': 0.0, 'peak': 0.0})
+    stage_stats['current'] = current
+    stage_stats['peak'] = max(stage_stats['peak'], stage_peak)
+    
+    print(f"[memory] {stage}: rss {current:.1f} MB ({delta:+.1f} MB), "
+          f"stage peak {stage_peak:.1f} MB, process-wide peak {process_peak:.1f} MB")
+    begin_memory_stage()
+    return current
+
+def tracemalloc_handler(sig, frame):
+    """Start tracemalloc on the first signal, then write a snapshot on each one after"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+        print("\n[memory] tracemalloc started, send signal again to write a snapshot")
+        return
+    write_tracemalloc_snapshot()
+
+def write_tracemalloc_snapshot(limit=25):
+    """Write the top allocations, and growth since the last snapshot, to temp/"""
+    snapshot = tracemalloc.take_snapshot()
+    snapshot_path = f"temp/tracemalloc_{time.strftime('%Y%m%d_%H%M%S')}.txt"
+    
+    current = get_current_rss_mb()
+    current_text = f"{current:.1f} MB" if current is not None else "unavailable"
+    lines = [f"Current RSS: {current_text}, "
+             f"process-wide peak RSS: {memory_stats.get('process_peak', 0.0):.1f} MB", ""]
+    lines.append(f"Top {limit} allocations:")
+    lines.extend(str(stat) for stat in snapshot.statistics('lineno')[:limit])
+    
+    previous = memory_stats.get('last_snapshot')
+    if previous is not None:
+        lines.extend(["", f"Top {limit} changes since last snapshot:"])
+        lines.extend(str(stat) for stat in snapshot.compare_to(previous, 'lineno')[:limit])
+    memory_stats['last_snapshot'] = snapshot
+    
+    with open(snapshot_path, 'w', encoding='utf-8') as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"\n[memory] tracemalloc snapshot written to {snapshot_path}")
+    return snapshot_path
+
+def save_worker_state(video_count):
+    """Save the loop position so a recycled worker carries on where it stopped"""
+    version, internal_state, gauss_next = random.getstate()
+    state = {
+        'video_count': video_count,
+        'random_state': [version, list(internal_state), gauss_next],
+    }
+    with open(WORKER_STATE_PATH, 'w', encoding='utf-8') as f:
+        json.dump(state, f)
+
+def load_worker_state():
+    """Restore and remove the state left by a recycled worker, returning the video count"""
+    if not os.path.exists(WORKER_STATE_PATH):
+        return 0
+    try:
+        with open(WORKER_STATE_PATH, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        version, internal_state, gauss_next = state['random_state']
+        random.setstate((version, tuple(internal_state), gauss_next))
+        video_count = int(state['video_count'])
+        print(f"Resuming recycled worker after {video_count} videos")
+        return video_count
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        print(f"Warning: Could not restore worker state: {e}")
+        return 0
+    finally:
+        try:
+            os.remove(WORKER_STATE_PATH)
+        except OSError:
+            pass
+
+def recycle_worker(video_count):
+    """Replace this process with a fresh one, keeping its position"""
+    save_worker_state(video_count)
+    print("[memory] Recycling worker to release memory...")
+    sys.stdout.flush()
+    sys.stderr.flush()
+    # Ignored signals stay ignored across execv, so a snapshot request cannot kill the new process
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    os.execv(sys.executable, [sys.executable] + sys.argv)
+
+# SIGUSR1 takes tracemalloc snapshots on demand (not available on Windows)
+if hasattr(signal, 'SIGUSR1'):
+    signal.signal(signal.SIGUSR1, tracemalloc_handler)
 
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully"""
@@ -608,7 +1267,7 @@ def signal_handler(sig, frame):
     should_continue = False
 
 def process_random_verse(surahs):
-    """Process a random verse and create a video"""
+    """Process a random verse and create its videos, returning how many were created"""
     # Get random verse
     surah_index = random.randint(0, len(surahs) - 1)
     surah = surahs[surah_index]
@@ -638,22 +1297,23 @@ def process_random_verse(surahs):
             
             # Create enhanced video
             start_time = time.time()
-            output_path = create_video(verse_data, surah)
+            output_paths = create_video(verse_data, surah)
             
-            if output_path and os.path.exists(output_path):
-                print(f"✨ Epic Quranic video created successfully: {output_path}")
+            if output_paths and all(os.path.exists(path) for path in output_paths):
+                for output_path in output_paths:
+                    print(f"✨ Epic Quranic video created successfully: {output_path}")
                 print(f"Time taken: {time.time() - start_time:.2f} seconds")
                 print(f"Video features: decorative borders, particle effects, dynamic lighting, clean audio")
-                return True
+                return len(output_paths)
             else:
                 print("Failed to create video")
-                return False
+                return 0
         else:
             print(f"Failed to fetch verse data: {response.status_code}")
-            return False
+            return 0
     except requests.RequestException as e:
         print(f"Error fetching verse data: {e}")
-        return False
+        return 0
 
 def main():
     global should_continue
@@ -662,6 +1322,9 @@ def main():
     # Set up signal handler for Ctrl+C
     signal.signal(signal.SIGINT, signal_handler)
     
+    if TRACEMALLOC_ENABLED and not tracemalloc.is_tracing():
+        tracemalloc.start(TRACEMALLOC_FRAMES)
+    
     try:
         print("Starting Continuous Epic Quranic Verse Video Generator...")
         print("Press Ctrl+C to stop the program safely.")
@@ -691,21 +1354,49 @@ def main():
             print("Error: Invalid surahs data format")
             return
         
-        # Continuously generate videos
-        video_count = 0
+        # Make sure libass draws the Arabic text at the size PIL mode would
+        if TEXT_RENDER_MODE == 'ass':
+            arabic_font_path = get_arabic_font()
+            if arabic_font_path:
+                check_ass_text_scale(arabic_font_path)
+        
+        # Continuously generate videos, carrying on from a recycled worker if there was one
+        video_count = load_worker_state()
+        
+        # A budget below what a fresh worker already uses would recycle after every job
+        recycling_enabled = bool(MEMORY_BUDGET_MB)
+        startup_rss = log_memory('startup')
+        if recycling_enabled and startup_rss is None:
+            print("[memory] Warning: current RSS is unavailable, the memory budget will not be enforced")
+            recycling_enabled = False
+        elif recycling_enabled and startup_rss > MEMORY_BUDGET_MB:
+            print(f"[memory] Warning: RSS is already {startup_rss:.1f} MB at startup, over the "
+                  f"{MEMORY_BUDGET_MB:.0f} MB budget; worker recycling is disabled")
+            recycling_enabled = False
+        
         while should_continue:
             print(f"\n===== Starting video #{video_count + 1} =====")
-            success = process_random_verse(surahs)
+            begin_memory_stage()
+            videos_created = process_random_verse(surahs)
             
-            if success:
-                video_count += 1
+            if videos_created:
+                video_count += videos_created
                 print(f"Total videos created: {video_count}")
             
+            # Drop this job's images and buffers
+            gc.collect()
+            current_rss = log_memory('job complete')
+            
             # Wait a bit before starting the next one
             # This helps prevent rate limiting and gives system resources a break
             if should_continue:
                 print("Waiting 5 seconds before starting next video...")
                 time.sleep(5)
+            
+            # Recycle the worker if it is still over budget
+            if should_continue and recycling_enabled and current_rss is not None and current_rss > MEMORY_BUDGET_MB:
+                print(f"[memory] RSS {current_rss:.1f} MB is over the {MEMORY_BUDGET_MB:.0f} MB budget")
+                recycle_worker(video_count)
         
         print(f"Program completed. Total videos created: {video_count}")
         